@@ -1,15 +1,34 @@
+import hashlib
 import io
+import itertools
 import re
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import streamlit as st
+from pandas.io.parsers import TextParser
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    import polars as pl  # optional: multithreaded Gruppierung für große Dateien
+except ImportError:
+    pl = None
 
 st.set_page_config(page_title="Excel-Duplikate prüfen & bereinigen", layout="wide")
 st.title("Excel-Duplikate prüfen & bereinigen")
 
 st.write("""
 **Prüfung A:** Duplikate, wenn **alle Spalten außer `externalId`** identisch sind  
-⇒ Downloads: bereinigte Datei + entfernte `externalId`s
+⇒ Download: bereinigte Datei, entfernte `externalId`s im zweiten Blatt
 
 **Prüfung B:** Duplikate, wenn die **Kernfelder** identisch sind, wobei `name` & Co. **normalisiert** werden:  
 `taxExemption, name, recipientCountry, category, vendorCountry, itemsTaxRate`  
@@ -21,23 +40,125 @@ st.write("""
 # Helpers: Einlesen & Export
 # ------------------------------------------------
 
+# Zeilen je Block beim zeilenweisen Einlesen
+READ_CHUNK_ROWS = 20_000
+
+def _convert_cell(value):
+    """Zellwert so aufbereiten wie pandas' calamine-Engine (ganzzahlige floats → int, Datum → Timestamp)."""
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, date):
+        return pd.Timestamp(value)
+    if isinstance(value, timedelta):
+        return pd.Timedelta(value)
+    return value
+
+def _cell_to_str(value) -> str:
+    """Datenzelle direkt als fertigen String: so hängt der Wert nicht davon ab, mit welchen
+    anderen Zellen pandas sie in einem Block zusammen sieht (z.B. True neben 1)."""
+    return value if isinstance(value, str) else str(_convert_cell(value))
+
+def _read_excel_streamed(file) -> pd.DataFrame:
+    """Erstes Blatt zeilenweise lesen und blockweise in str-DataFrames wandeln.
+
+    Wie `pd.read_excel(file, dtype=str, engine="calamine")`, hält aber nie alle Zeilen
+    gleichzeitig als Python-Listen im Speicher. Datenzellen werden schon beim Lesen zu str,
+    damit die Typ-Ableitung je Block keine Rolle spielt. Abweichung: pandas legt True und 1
+    in einer Spalte zusammen, je nachdem was zuerst vorkommt ([True, 1] → "True", "True";
+    [1, True] → "1", "1"); hier bleibt jede Zelle bei ihrem eigenen Wert ("True" bzw. "1").
+    """
+    sheet = CalamineWorkbook.from_filelike(file).get_sheet_by_index(0)
+    if sheet.start is None:
+        return pd.DataFrame()
+    # iter_rows() beginnt bei der ersten belegten Spalte, pandas bei Spalte A
+    pad = [""] * sheet.start[1]
+    raw_rows = sheet.iter_rows()
+    header = next(raw_rows, None)
+    if header is None:
+        return pd.DataFrame()
+    header = [_convert_cell(v) for v in pad + header]
+    rows = ([_cell_to_str(v) for v in pad + row] for row in raw_rows)
+
+    chunks = []
+    while True:
+        block = list(itertools.islice(rows, READ_CHUNK_ROWS))
+        parser = TextParser([header, *block], header=0, dtype=str, skip_blank_lines=False)
+        chunks.append(parser.read())
+        if len(block) < READ_CHUNK_ROWS:
+            break
+    return pd.concat(chunks, ignore_index=True)
+
 def read_excel_as_str(file) -> pd.DataFrame:
     """Excel einlesen (alle Spalten als str), führende Nullen bleiben erhalten."""
-    df = pd.read_excel(file, dtype=str)
-    df = df.fillna("")
-    # trim
-    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+    if CalamineWorkbook is not None:
+        # calamine (Rust) parst deutlich schneller und sparsamer als openpyxl
+        df = _read_excel_streamed(file)
+    else:
+        # python-calamine nicht installiert → openpyxl
+        df = pd.read_excel(file, dtype=str, engine="openpyxl")
+    # leere Zellen → "" und trimmen: ein Arrow-Durchlauf je Spalte, Ergebnis bleibt Arrow-String
+    for c in df.columns:
+        arr = pc.utf8_trim_whitespace(pa.array(df[c], type=pa.string(), from_pandas=True))
+        df[c] = pd.arrays.ArrowStringArray(pc.fill_null(arr, ""))
     return df
 
-def to_excel_bytes(df: pd.DataFrame, sheet_name: str) -> bytes:
+def to_excel_bytes(sheets: dict) -> bytes:
+    """Ein oder mehrere DataFrames ({Blattname: df}) als eine Arbeitsmappe."""
     buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    # xlsxwriter schreibt deutlich schneller als openpyxl.
+    # Kein constant_memory: pandas schreibt spaltenweise, das verträgt der Modus nicht.
+    with pd.ExcelWriter(
+        buffer,
+        engine="xlsxwriter",
+        engine_kwargs={"options": {"strings_to_urls": False}},
+    ) as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
     return buffer.getvalue()
 
+# ab dieser Zeilenzahl lohnt sich der Umweg über Polars
+POLARS_MIN_ROWS = 10_000
+
+def _group_ids(frame: pd.DataFrame, cols):
+    """Gruppen-ID je Zeile (gleiche Werte in `cols` ⇒ gleiche ID) + Duplikat-Maske in einem Durchlauf."""
+    # reine Categorical-Schlüssel (Prüfung B) bleiben auf den int-Codes – schneller als Polars
+    all_codes = all(isinstance(frame[c].dtype, pd.CategoricalDtype) for c in cols)
+    if pl is not None and len(frame) >= POLARS_MIN_ROWS and not all_codes:
+        return _group_ids_polars(frame, cols)
+    # Schlüssel aus den Spalten-Codes zusammensetzen (Mischbasis) statt Strings zu hashen:
+    # exakt, ohne Hash-Kollisionen; nur bei drohendem int64-Überlauf neu verdichten
+    keys = np.zeros(len(frame), dtype=np.int64)
+    span = 1
+    for c in cols:
+        codes, uniques = pd.factorize(frame[c], use_na_sentinel=False)
+        if span * len(uniques) >= 2**62:
+            keys, uniq_keys = pd.factorize(keys)
+            span = len(uniq_keys)
+        keys = keys * len(uniques) + codes
+        span *= max(len(uniques), 1)
+    # dichte IDs per Hash statt Sortierung, Gruppengrößen per bincount
+    gid = pd.factorize(keys)[0]
+    return gid, np.bincount(gid)[gid] > 1
+
+def _group_ids_polars(frame: pd.DataFrame, cols):
+    """Wie `_group_ids`, aber als Polars-Lazy-Plan (Gruppen-ID = erste Zeilennummer der Gruppe)."""
+    # Spalten neutral benennen: Excel-Header können Zahlen sein, Polars will str
+    names = [f"c{i}" for i in range(len(cols))]
+    data = pl.from_pandas(frame[cols].set_axis(names, axis=1), include_index=False)
+    out = (
+        data.lazy()
+        .with_row_index("_row")
+        .select(
+            pl.col("_row").min().over(names).alias("gid"),
+            (pl.len().over(names) > 1).alias("dup"),
+        )
+        .collect()
+    )
+    return out["gid"].to_numpy(), out["dup"].to_numpy()
+
 def highlight_mask(df: pd.DataFrame, mask):
-    styles = pd.DataFrame("", index=df.index, columns=df.columns)
-    styles.loc[mask, :] = "background-color: #ffd6cc"  # hellrot/orange
+    styles = np.full(df.shape, "", dtype=object)
+    styles[np.asarray(mask)] = "background-color: #ffd6cc"  # hellrot/orange
     return styles
 
 # ------------------------------------------------
@@ -49,20 +170,27 @@ def run_check_A(df: pd.DataFrame, id_col="externalId"):
         raise ValueError(f"Spalte '{id_col}' fehlt.")
     compare_cols = [c for c in df.columns if c != id_col]
 
-    dup_mask = df.duplicated(subset=compare_cols, keep=False)
-
-    # stabil sortieren: Keys + externalId (string, behält führende Nullen)
-    df_sorted = df.copy()
-    df_sorted["_idx"] = range(len(df_sorted))
-    df_sorted = df_sorted.sort_values(by=[*compare_cols, id_col], kind="mergesort")
-    df_sorted["_keep"] = ~df_sorted.duplicated(subset=compare_cols, keep="first")
-
-    cleaned_df = df_sorted[df_sorted["_keep"]].drop(columns=["_idx", "_keep"]).reset_index(drop=True)
-    removed_rows_sorted = df_sorted[~df_sorted["_keep"]]
-    removed_ids_df = removed_rows_sorted[[id_col]].drop_duplicates().reset_index(drop=True)
-
-    removed_count = len(removed_rows_sorted)
-    group_count = df.loc[dup_mask, compare_cols].drop_duplicates().shape[0] if dup_mask.any() else 0
+    gid, dup = _group_ids(df, compare_cols)
+    dup_mask = pd.Series(dup, index=df.index)
+
+    # je Gruppe die kleinste externalId behalten (String-Vergleich, behält führende Nullen):
+    # nur Gruppen-ID + ID-Rang sortieren statt des ganzen Frames über alle Spalten
+    id_rank = pd.factorize(df[id_col], sort=True)[0]
+    order = np.lexsort((id_rank, gid))
+    gid_sorted = gid[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = gid_sorted[1:] != gid_sorted[:-1]
+    keep = np.zeros(len(df), dtype=bool)
+    keep[order[first]] = True
+
+    # positionsbasiert auswählen (take) statt Label-Ausrichtung per Bool-Maske
+    cleaned_df = df.take(np.flatnonzero(keep)).reset_index(drop=True)
+    # von den entfernten Zeilen wird nur die ID-Spalte gebraucht
+    removed_ids = df[id_col].take(np.flatnonzero(~keep))
+    removed_ids_df = removed_ids.drop_duplicates().to_frame().reset_index(drop=True)
+
+    removed_count = len(removed_ids)
+    group_count = int(np.unique(gid[dup]).size)
     return dup_mask, cleaned_df, removed_ids_df, removed_count, group_count
 
 # ------------------------------------------------
@@ -84,56 +212,90 @@ _REM_WORDS = {
     "services", "service", "fa/ooe", "fa\\ooe", "fa ooe"
 }
 
-def _to_ascii_lower(s: str) -> str:
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    return s.lower()
+# alle Zeichen mit Combining-Klasse (Akzente etc.) – liegen sämtlich unterhalb U+20000
+_COMBINING = "[" + "".join(chr(c) for c in range(0x20000) if unicodedata.combining(chr(c))) + "]"
 
-def _norm_bool(s: str) -> str:
-    s_l = s.strip().lower()
-    return "true" if s_l in {"true", "1", "yes", "y", "wahr"} else "false" if s_l in {"false", "0", "no", "n", "falsch"} else s_l
+# Regex-Muster einmalig auf Modulebene; bewusst als str (nicht re.compile), damit pandas
+# sie an die Arrow-Regex-Engine durchreicht statt auf Python-Callbacks zurückzufallen.
+_RE_PARENS = r"\([^)]*\)"
+_RE_DASH = "[–—-]"
+_RE_NONALNUM = r"[^a-z0-9\s\.,]"
+_RE_STOP = r"\b(?:" + "|".join(re.escape(w) for w in sorted(_REM_WORDS, key=len, reverse=True)) + r")\b"
+# Whitespace wie Pythons `\s`: RE2 (Arrow) kennt unter `\s` nur [\t\n\f\r ], daher die übrigen
+# Unicode-Leerzeichen als Literale ergänzen
+_RE_WS = r"[\s" + "\x0b\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000" + "]+"
 
-def _norm_rate(s: str) -> str:
-    # 8,1% / 0.081 → numerisch robust
-    t = s.strip().replace("%", "")
-    t = t.replace(",", ".")
+_TRUE_VALUES = ["true", "1", "yes", "y", "wahr"]
+_FALSE_VALUES = ["false", "0", "no", "n", "falsch"]
+
+# Die Normalisierer arbeiten spaltenweise auf Arrow-Strings (vektorisiert statt Callback je Zelle).
+
+def _to_ascii_lower(s: pd.Series) -> pd.Series:
+    s = s.astype("string[pyarrow]").str.normalize("NFKD")
+    s = s.str.replace(_COMBINING, "", regex=True)
+    return s.str.lower()
+
+def _strip(s: pd.Series) -> pd.Series:
+    # wie str.strip(): Arrows utf8_trim_whitespace lässt z.B. \x1c-\x1f stehen
+    return s.str.replace(rf"^{_RE_WS}|{_RE_WS}$", "", regex=True)
+
+def _norm_bool(s: pd.Series) -> pd.Series:
+    s_l = _strip(s.astype("string[pyarrow]")).str.lower()
+    return s_l.mask(s_l.isin(_TRUE_VALUES), "true").mask(s_l.isin(_FALSE_VALUES), "false")
+
+def _rate_value(t: str):
     try:
         val = float(t)
-        # falls > 1 als Prozent interpretieren (8.1 -> 0.081)
-        if val > 1.0:
-            val = val / 100.0
-        return f"{val:.6f}"
-    except Exception:
-        return _to_ascii_lower(s).strip()
-
-def _norm_name(s: str) -> str:
-    if not isinstance(s, str):
-        s = str(s)
+    except ValueError:
+        return None
+    # falls > 1 als Prozent interpretieren (8.1 -> 0.081)
+    if val > 1.0:
+        val = val / 100.0
+    return f"{val:.6f}"
+
+def _norm_rate(s: pd.Series) -> pd.Series:
+    # 8,1% / 0.081 → numerisch robust
+    t = _strip(s.astype("string[pyarrow]")).str.replace("%", "", regex=False)
+    t = t.str.replace(",", ".", regex=False)
+    # Zahl selbst per float() parsen (läuft über _per_unique nur je eindeutigem Wert):
+    # pd.to_numeric rundet große Exponenten anders und kennt weder "1_000", "nan" noch Überlauf → inf
+    val = t.map(_rate_value, na_action="ignore")
+    # nicht numerisch → nur ascii+lower+trim
+    return val.where(val.notna(), _strip(_to_ascii_lower(s)))
+
+def _norm_name(s: pd.Series) -> pd.Series:
     s = _to_ascii_lower(s)
 
     # Klammerinhalte entfernen
-    s = re.sub(r"\([^)]*\)", " ", s)
+    s = s.str.replace(_RE_PARENS, " ", regex=True)
 
     # lange/kurze Gedankenstriche & Bindestriche in Spaces umwandeln
-    s = s.replace("–", " ").replace("—", " ").replace("-", " ")
+    s = s.str.replace(_RE_DASH, " ", regex=True)
 
     # nicht-alphanumerische Zeichen (außer Leerzeichen & Komma/Punkt für Zahlen) entfernen
-    s = re.sub(r"[^a-z0-9\s\.,]", " ", s)
+    s = s.str.replace(_RE_NONALNUM, " ", regex=True)
 
-    # Stoppwörter entfernen (services/service/fa/ooe)
-    for w in _REM_WORDS:
-        s = re.sub(rf"\b{re.escape(w)}\b", " ", s)
+    # Stoppwörter entfernen (services/service/fa/ooe) – ein Durchlauf für alle
+    s = s.str.replace(_RE_STOP, " ", regex=True)
 
     # Zahlenformate vereinheitlichen (8,1 -> 8.1)
-    s = s.replace(",", ".")
+    s = s.str.replace(",", ".", regex=False)
 
     # Mehrfach-Whitespace zusammenfassen & trimmen
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return s.str.replace(_RE_WS, " ", regex=True).str.strip()
 
-def _norm_text(s: str) -> str:
+def _norm_text(s: pd.Series) -> pd.Series:
     # für Länder/Category etc.: ascii+lower+trim
-    return re.sub(r"\s+", " ", _to_ascii_lower(s)).strip()
+    return _to_ascii_lower(s).str.replace(_RE_WS, " ", regex=True).str.strip()
+
+def _per_unique(func, s: pd.Series) -> pd.Series:
+    """`func` nur auf die eindeutigen Werte anwenden (Namen/Länder wiederholen sich stark) und zurückverteilen."""
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    normed = func(pd.Series(uniques)).to_numpy(dtype=object)
+    # als Categorical mit sortierten Kategorien zurückgeben: die Gruppierung arbeitet dann
+    # direkt auf den int-Codes (kein erneutes String-Hashing), Sortierung bleibt lexikalisch
+    norm_codes, categories = pd.factorize(normed, sort=True)
+    return pd.Series(pd.Categorical.from_codes(norm_codes[codes], categories=categories), index=s.index)
 
 def normalize_core_view(df: pd.DataFrame) -> pd.DataFrame:
     """Erzeugt eine normalisierte Sicht nur der CORE_FIELDS."""
@@ -142,40 +304,80 @@ def normalize_core_view(df: pd.DataFrame) -> pd.DataFrame:
         raise ValueError(f"Folgende Spalten fehlen für Prüfung B: {', '.join(missing)}")
 
     view = pd.DataFrame(index=df.index)
-    view["taxExemption"] = df["taxExemption"].map(_norm_bool)
-    view["name"] = df["name"].map(_norm_name)
-    view["recipientCountry"] = df["recipientCountry"].map(_norm_text)
-    view["category"] = df["category"].map(_norm_text)
-    view["vendorCountry"] = df["vendorCountry"].map(_norm_text)
-    view["itemsTaxRate"] = df["itemsTaxRate"].map(_norm_rate)
+    view["taxExemption"] = _per_unique(_norm_bool, df["taxExemption"])
+    view["name"] = _per_unique(_norm_name, df["name"])
+    view["recipientCountry"] = _per_unique(_norm_text, df["recipientCountry"])
+    view["category"] = _per_unique(_norm_text, df["category"])
+    view["vendorCountry"] = _per_unique(_norm_text, df["vendorCountry"])
+    view["itemsTaxRate"] = _per_unique(_norm_rate, df["itemsTaxRate"])
     return view
 
-def run_check_B(df: pd.DataFrame, id_col="externalId"):
-    norm = normalize_core_view(df)
+def run_check_B(df: pd.DataFrame, id_col="externalId", norm=None):
+    if norm is None:
+        norm = normalize_core_view(df)
 
     # Duplikate nach normalisierten Kernfeldern
-    dup_mask_core = norm.duplicated(subset=CORE_FIELDS, keep=False)
+    _, dup_core = _group_ids(norm, CORE_FIELDS)
+    dup_mask_core = pd.Series(dup_core, index=norm.index)
 
     # externalIds der Zeilen, die in Duplikat-Gruppen fallen
-    external_ids_in_groups = df.loc[dup_mask_core, id_col].drop_duplicates().reset_index(drop=True)
+    dup_idx = np.flatnonzero(dup_core)
+    external_ids_in_groups = df[id_col].take(dup_idx).drop_duplicates().reset_index(drop=True)
 
     # Ansicht der Gruppen (normalisierte Schlüssel + original externalId)
-    view = norm.copy()
-    view[id_col] = df[id_col]
-    duplicates_view = view.loc[dup_mask_core, CORE_FIELDS + [id_col]] \
+    # erst filtern, dann externalId anhängen – kein Kopieren der kompletten Sicht
+    duplicates_view = norm[CORE_FIELDS].take(dup_idx) \
+                          .assign(**{id_col: df[id_col].to_numpy()[dup_idx]}) \
                           .sort_values(CORE_FIELDS + [id_col], kind="mergesort")
 
     return dup_mask_core, external_ids_in_groups, duplicates_view
 
+# ------------------------------------------------
+# Caching: Ergebnisse je Datei-Inhalt wiederverwenden
+# ------------------------------------------------
+# Jede Widget-Interaktion (z.B. Download-Klick) startet das Skript neu.
+# Die Funktionen unten sind am Inhalt der Datei (`file_key`) verankert,
+# damit Einlesen, Prüfungen und Export dabei nicht erneut laufen.
+# Nur die letzten Dateien behalten: jeder Eintrag hält ganze DataFrames bzw. Arbeitsmappen im Speicher.
+CACHE_MAX_ENTRIES = 4
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def load_excel(file_key: str, _data: bytes) -> pd.DataFrame:
+    return read_excel_as_str(io.BytesIO(_data))
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def cached_check_A(file_key: str, _df: pd.DataFrame, id_col="externalId"):
+    return run_check_A(_df, id_col=id_col)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def cached_core_view(file_key: str, _df: pd.DataFrame) -> pd.DataFrame:
+    # eigener Cache-Eintrag: weitere Prüfungen auf den Kernfeldern teilen sich die Normalisierung
+    return normalize_core_view(_df)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def cached_check_B(file_key: str, _df: pd.DataFrame, id_col="externalId"):
+    return run_check_B(_df, id_col=id_col, norm=cached_core_view(file_key, _df))
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def cached_excel_bytes(file_key: str, sheet_names: tuple, _frames: tuple) -> bytes:
+    return to_excel_bytes(dict(zip(sheet_names, _frames)))
+
 # ------------------------------------------------
 # UI
 # ------------------------------------------------
 
+# Styler erzeugt je Zelle einen CSS-String → nur einen Ausschnitt einfärben
+DUP_PREVIEW_ROWS = 500
+# Ergebnis-Tabellen gehen komplett als Arrow an den Browser → Vorschau begrenzen
+TABLE_PREVIEW_ROWS = 1000
+
 uploaded = st.file_uploader("Excel-Datei hochladen (.xlsx)", type=["xlsx"])
 
 if uploaded:
+    data = uploaded.getvalue()
+    file_key = hashlib.sha256(data).hexdigest()
     try:
-        df_input = read_excel_as_str(uploaded)
+        df_input = load_excel(file_key, data)
     except Exception as e:
         st.error(f"Fehler beim Laden der Datei: {e}")
         st.stop()
@@ -185,55 +387,65 @@ if uploaded:
 
     if st.button("Prüfungen ausführen"):
         try:
+            # A und B sind unabhängig und laufen großteils in C (pandas/Arrow, GIL frei) → parallel.
+            # Die Worker erben den Skript-Kontext, damit st.cache_data darin funktioniert.
+            with ThreadPoolExecutor(
+                max_workers=2, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())
+            ) as pool:
+                future_A = pool.submit(cached_check_A, file_key, df_input, id_col="externalId")
+                future_B = pool.submit(cached_check_B, file_key, df_input, id_col="externalId")
+
             # ---------- Prüfung A ----------
             st.markdown("## Prüfung A – Duplikate (alle Spalten außer `externalId`)")
 
-            dup_mask_A, cleaned_df, removed_ids_df, removed_count, group_count = run_check_A(df_input, id_col="externalId")
+            dup_mask_A, cleaned_df, removed_ids_df, removed_count, group_count = future_A.result()
             st.success(f"Prüfung A: {removed_count} Zeile(n) entfernt in {group_count} Duplikat-Gruppe(n).")
 
             if dup_mask_A.any():
                 st.subheader("Gefundene Duplikate (A) – farblich markiert")
+                dup_rows_A = df_input.take(np.flatnonzero(dup_mask_A))
+                dup_preview_A = dup_rows_A.head(DUP_PREVIEW_ROWS)
                 st.dataframe(
-                    df_input.style.apply(lambda _: highlight_mask(df_input, dup_mask_A), axis=None),
+                    dup_preview_A.style.apply(lambda d: highlight_mask(d, dup_mask_A.loc[d.index]), axis=None),
                     use_container_width=True,
                 )
+                if len(dup_rows_A) > len(dup_preview_A):
+                    st.caption(f"Anzeige der ersten {len(dup_preview_A)} von {len(dup_rows_A)} Duplikat-Zeilen.")
             else:
                 st.info("Prüfung A: Keine Duplikate gefunden.")
 
             st.subheader("Bereinigte Tabelle (A) – Export-Vorschau")
-            st.dataframe(cleaned_df, use_container_width=True)
+            st.dataframe(cleaned_df.head(TABLE_PREVIEW_ROWS), use_container_width=True)
+            if len(cleaned_df) > TABLE_PREVIEW_ROWS:
+                st.caption(f"Vorschau der ersten {TABLE_PREVIEW_ROWS} von {len(cleaned_df)} Zeilen – vollständige Daten im Download.")
 
-            # Downloads A
-            cleaned_bytes = to_excel_bytes(cleaned_df, sheet_name="Bereinigt")
+            # Download A: eine Arbeitsmappe, bereinigte Daten + entfernte externalIds als zweites Blatt
+            cleaned_bytes = cached_excel_bytes(
+                file_key, ("Bereinigt", "Entfernte_externalIds"), (cleaned_df, removed_ids_df)
+            )
             st.download_button(
-                label="(A) Bereinigte Excel herunterladen (.xlsx)",
+                label="(A) Bereinigte Excel inkl. entfernter externalIds herunterladen (.xlsx)",
                 data=cleaned_bytes,
                 file_name="bereinigt_ohne_duplikate.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
 
-            removed_bytes = to_excel_bytes(removed_ids_df, sheet_name="Entfernte_externalIds")
-            st.download_button(
-                label="(A) Entfernte externalIds herunterladen (.xlsx)",
-                data=removed_bytes,
-                file_name="entfernte_externalIds.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
-
             st.markdown("---")
 
             # ---------- Prüfung B ----------
             st.markdown("## Prüfung B – Duplikate nach normalisierten Kernfeldern (ohne `externalId` & `code`)")
 
-            dup_mask_B, ext_ids_core_dups, duplicates_view_B = run_check_B(df_input, id_col="externalId")
+            dup_mask_B, ext_ids_core_dups, duplicates_view_B = future_B.result()
 
             if dup_mask_B.any():
                 st.success(f"Prüfung B: {len(ext_ids_core_dups)} `externalId`(s) gehören zu Duplikat-Gruppen basierend auf normalisierten Kernfeldern.")
                 st.subheader("Ansicht der Duplikat-Gruppen (B) – normalisierte Schlüssel + externalId")
-                st.dataframe(duplicates_view_B, use_container_width=True)
+                st.dataframe(duplicates_view_B.head(TABLE_PREVIEW_ROWS), use_container_width=True)
+                if len(duplicates_view_B) > TABLE_PREVIEW_ROWS:
+                    st.caption(f"Vorschau der ersten {TABLE_PREVIEW_ROWS} von {len(duplicates_view_B)} Zeilen.")
 
                 # Download nur externalIds (B)
-                ext_ids_B_bytes = to_excel_bytes(ext_ids_core_dups.to_frame(name="externalId"), sheet_name="externalIds_Duplikate_B")
+                ext_ids_B_bytes = cached_excel_bytes(file_key, ("externalIds_Duplikate_B",), (ext_ids_core_dups.to_frame(name="externalId"),))
                 st.download_button(
                     label="(B) externalIds der Duplikate (Kernfelder) herunterladen (.xlsx)",
                     data=ext_ids_B_bytes,
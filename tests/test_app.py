@@ -0,0 +1,193 @@
+import importlib.util
+import io
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+APP_PATH = Path(__file__).resolve().parents[1] / "app.py"
+
+
+@pytest.fixture(scope="module")
+def app():
+    # app.py ist ein Streamlit-Skript; ohne Runtime laufen die st.*-Aufrufe im Bare-Mode
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    spec = importlib.util.spec_from_file_location("app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ------------------------------------------------
+# Normalisierer (Prüfung B)
+# ------------------------------------------------
+
+def test_norm_rate(app):
+    s = pd.Series(["8,1%", "0.081", "8.1", " 20 ", "abc", ""])
+    assert app._norm_rate(s).tolist() == ["0.081000", "0.081000", "0.081000", "0.200000", "abc", ""]
+
+
+def test_norm_rate_parses_like_float(app):
+    # Zahlen werden wie bisher per float() gelesen: Unterstriche, Nicht-ASCII-Ziffern, nan, Überlauf
+    s = pd.Series(["1_000", "٣", "NaN%", "1e400", " 8,1 %\x1c"])
+    assert app._norm_rate(s).tolist() == ["10.000000", "0.030000", "nan", "inf", "0.081000"]
+
+
+def test_norm_text_collapses_unicode_whitespace(app):
+    # wie Pythons \s, nicht nur RE2s [\t\n\f\r ]
+    s = pd.Series(["a\x0bb", "\x1cde  x\x85", "at\u2028\u2029 ch"])
+    assert app._norm_text(s).tolist() == ["a b", "de x", "at ch"]
+    assert app._norm_bool(pd.Series(["\x1cTRUE\x85"])).tolist() == ["true"]
+
+
+def test_norm_text_lowercases_per_character(app):
+    # Arrow senkt zeichenweise ab: Σ → σ (nicht ς am Wortende), İ → i (nicht i + Punkt)
+    s = pd.Series(["ΟΔΟΣ", "İstanbul", " Café  DE "])
+    assert app._norm_text(s).tolist() == ["οδοσ", "istanbul", "cafe de"]
+
+
+def test_norm_name(app):
+    s = pd.Series(["Müller–Services (AT)", "FA/OOE Steuer, 8,1%"])
+    assert app._norm_name(s).tolist() == ["muller", "steuer. 8.1"]
+
+
+def test_norm_bool(app):
+    s = pd.Series([" TRUE", "0", "wahr", "maybe"])
+    assert app._norm_bool(s).tolist() == ["true", "false", "true", "maybe"]
+
+
+# ------------------------------------------------
+# Einlesen
+# ------------------------------------------------
+
+def _write_xlsx(path, rows):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 20_000])
+def test_read_excel_mixed_column_independent_of_block(app, tmp_path, monkeypatch, chunk_rows):
+    pytest.importorskip("python_calamine")
+    values = [True, 1, "x", 1, 1, 1, True]
+    path = _write_xlsx(tmp_path / "mixed.xlsx", [["externalId", "f"], *([str(i), v] for i, v in enumerate(values))])
+    monkeypatch.setattr(app, "READ_CHUNK_ROWS", chunk_rows)
+
+    with open(path, "rb") as fh:
+        df = app.read_excel_as_str(fh)
+
+    assert df["f"].tolist() == ["True", "1", "x", "1", "1", "1", "True"]
+    assert df["externalId"].tolist() == [str(i) for i in range(len(values))]
+
+
+def test_read_excel_types_and_empty_cells(app, tmp_path):
+    pytest.importorskip("python_calamine")
+    path = _write_xlsx(tmp_path / "types.xlsx", [
+        ["externalId", "rate", "name", 2024],
+        ["007", 1.5, "  Müller ", None],
+        ["8", 2.0, "NA", "x"],
+    ])
+
+    with open(path, "rb") as fh:
+        df = app.read_excel_as_str(fh)
+
+    assert list(df.columns) == ["externalId", "rate", "name", 2024]
+    assert df.to_dict("list") == {
+        "externalId": ["007", "8"],
+        "rate": ["1.5", "2"],
+        "name": ["Müller", ""],
+        2024: ["", "x"],
+    }
+
+
+# ------------------------------------------------
+# Export
+# ------------------------------------------------
+
+def test_to_excel_bytes_round_trip(app):
+    pytest.importorskip("xlsxwriter")
+    pytest.importorskip("openpyxl")
+    cleaned = pd.DataFrame({"externalId": ["007", "8"], "name": ["Müller", "https://example.com"]})
+    removed = pd.DataFrame({"externalId": ["010"]})
+    extra = pd.DataFrame({"x": ["1"]})
+
+    data = app.to_excel_bytes({"Bereinigt": cleaned, "Entfernte_externalIds": removed, "Anhang": extra})
+    sheets = pd.read_excel(io.BytesIO(data), sheet_name=None, dtype=str)
+
+    # Blätter in Einfügereihenfolge, nicht alphabetisch
+    assert list(sheets) == ["Bereinigt", "Entfernte_externalIds", "Anhang"]
+    pd.testing.assert_frame_equal(sheets["Bereinigt"], cleaned)
+    pd.testing.assert_frame_equal(sheets["Entfernte_externalIds"], removed)
+    pd.testing.assert_frame_equal(sheets["Anhang"], extra)
+
+
+# ------------------------------------------------
+# Gruppierung
+# ------------------------------------------------
+
+def test_group_ids_categorical_keys_skip_polars(app, monkeypatch):
+    monkeypatch.setattr(app, "POLARS_MIN_ROWS", 0)
+    monkeypatch.setattr(app, "_group_ids_polars", lambda *_: pytest.fail("Polars-Pfad für Categoricals"))
+    frame = pd.DataFrame({
+        "a": pd.Categorical(["x", "y", "x", "z"]),
+        "b": pd.Categorical(["1", "1", "1", "1"]),
+    })
+
+    gid, dup = app._group_ids(frame, ["a", "b"])
+
+    assert dup.tolist() == [True, False, True, False]
+    assert gid[0] == gid[2] and len(set(gid)) == 3
+
+
+def test_group_ids_polars_matches_pandas(app, monkeypatch):
+    pytest.importorskip("polars")
+    df = pd.DataFrame({
+        "externalId": ["1", "2", "3", "4", "5", "6", "7", "8"],
+        "name": ["", "", "Abc", "abc", "ABC", "abc", "", "x"],
+        2024: ["", "", "a", "a", "a", "a", "A", ""],
+    }, dtype="string[pyarrow]")
+    polars_calls = []
+    polars_impl = app._group_ids_polars
+    monkeypatch.setattr(app, "_group_ids_polars", lambda *a: polars_calls.append(1) or polars_impl(*a))
+
+    results = []
+    for min_rows in (0, 10**12):
+        monkeypatch.setattr(app, "POLARS_MIN_ROWS", min_rows)
+        gid, dup = app._group_ids(df, ["name", 2024])
+        results.append((pd.factorize(gid)[0].tolist(), dup.tolist(), app.run_check_A(df)))
+
+    (gid_pl, dup_pl, res_pl), (gid_pd, dup_pd, res_pd) = results
+    # Leerstrings gruppieren, Groß-/Kleinschreibung trennt
+    assert dup_pd == [True, True, False, True, False, True, False, False]
+    assert (gid_pl, dup_pl) == (gid_pd, dup_pd)
+    pd.testing.assert_series_equal(res_pl[0], res_pd[0])
+    pd.testing.assert_frame_equal(res_pl[1], res_pd[1])
+    pd.testing.assert_frame_equal(res_pl[2], res_pd[2])
+    assert res_pl[3:] == res_pd[3:] == (2, 2)
+    assert len(polars_calls) == 2
+
+
+# ------------------------------------------------
+# Prüfung A
+# ------------------------------------------------
+
+def test_run_check_A_keeps_smallest_id_in_input_order(app):
+    df = pd.DataFrame({
+        "externalId": ["003", "7", "002", "010", "5", "8", "5"],
+        "name": ["x", "y", "x", "x", "z", "w", "z"],
+        "rate": ["1", "2", "1", "1", "3", "4", "3"],
+    })
+
+    dup_mask, cleaned, removed_ids, removed_count, group_count = app.run_check_A(df)
+
+    assert dup_mask.tolist() == [True, False, True, True, True, False, True]
+    # "002" < "003" < "010" als String; bei gleicher ID bleibt die erste Zeile (vor "8")
+    assert cleaned["externalId"].tolist() == ["7", "002", "5", "8"]
+    assert cleaned.index.tolist() == [0, 1, 2, 3]
+    assert removed_ids.to_dict("list") == {"externalId": ["003", "010", "5"]}
+    assert (removed_count, group_count) == (3, 2)